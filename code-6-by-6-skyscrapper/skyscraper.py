@@ -0,0 +1,1248 @@
+import collections
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# Helper: count visible skyscrapers in a sequence.
+def visible(seq):
+    cnt, max_seen = 0, 0
+    for x in seq:
+        if x > max_seen:
+            cnt += 1
+            max_seen = x
+    return cnt
+
+
+# Pack a row into a single integer: for each column j the number x is
+# represented as (1 << (x-1)) shifted left by (j*n) bits, so two rows clash
+# in some column exactly when their masks share a bit. A row of an n x n grid
+# therefore needs n*n bits (36 for 6x6, 49 for 7x7).
+def compute_mask(row, n):
+    m = 0
+    for j, num in enumerate(row):
+        m |= (1 << (num - 1)) << (j * n)
+    return m
+
+
+# Compact containers. Rows are stored back to back in one bytes object (one
+# byte per cell), rank lists as array('H') while ranks fit in 16 bits and
+# masks as array('Q') while they fit in 64 bits (n <= 8); beyond that plain
+# lists are used. Tuples are only made when a row is asked for.
+class RowView:
+    def __init__(self, data, n):
+        self.data = data
+        self.n = n
+
+    def __len__(self):
+        return len(self.data) // self.n
+
+    def __getitem__(self, rank):
+        return tuple(self.data[rank * self.n:(rank + 1) * self.n])
+
+    def __iter__(self):
+        for rank in range(len(self)):
+            yield self[rank]
+
+
+def rank_array(ranks, count):
+    return array('H' if count <= 1 << 16 else 'I', ranks)
+
+
+def mask_array(masks, n):
+    return array('Q', masks) if n * n <= 64 else list(masks)
+
+
+# Grids travel as flat byte buffers (row-major, one byte per cell) inside the
+# caches and stores, and as tuples of row tuples through the public API.
+def pack_grid(grid):
+    return bytes(x for row in grid for x in row)
+
+
+def unpack_grid(data, n):
+    return tuple(tuple(data[r * n:(r + 1) * n]) for r in range(n))
+
+
+# All permutation data the solvers need for one grid size n, indexed by
+# permutation rank (the position of the row in itertools.permutations order):
+#   rows[rank]  -> the row tuple (a RowView over packed bytes)
+#   left[rank]  -> number of skyscrapers visible from the left
+#   right[rank] -> number of skyscrapers visible from the right
+#   masks[rank] -> packed n*n-bit column mask (see compute_mask)
+#
+# by_clues maps every (left, right) clue pair, 0 meaning "don't care", to the
+# ranks of the rows that satisfy it; mask_by_clues holds the matching masks in
+# the same order. A column read top-to-bottom is a permutation as well, so the
+# same index serves (top, bottom) column clue pairs. The arrays are shared:
+# callers must not modify them.
+#
+# The search itself works on bitsets over ranks (bit `rank` set = that
+# permutation is still a candidate):
+#   bits_by_clues[(left, right)] -> by_clues as a bitset
+#   value_bits[j][x]             -> ranks whose value at position j is x
+#   clear_bits[j][x]             -> every other rank
+class PermTable:
+    def __init__(self, n):
+        self.n = n
+        perms = list(itertools.permutations(range(1, n + 1)))
+        count = len(perms)
+        self.rows = RowView(bytes(x for row in perms for x in row), n)
+        self.left = bytes(visible(row) for row in perms)
+        self.right = bytes(visible(row[::-1]) for row in perms)
+        self.masks = mask_array((compute_mask(row, n) for row in perms), n)
+
+        by_clues = {}
+        for left in range(n + 1):
+            for right in range(n + 1):
+                by_clues[(left, right)] = []
+        for rank in range(count):
+            left, right = self.left[rank], self.right[rank]
+            for pair in ((left, right), (0, right), (left, 0), (0, 0)):
+                by_clues[pair].append(rank)
+        self.by_clues = {}
+        self.mask_by_clues = {}
+        self.bits_by_clues = {}
+        for pair, ranks in by_clues.items():
+            self.by_clues[pair] = rank_array(ranks, count)
+            self.mask_by_clues[pair] = mask_array((self.masks[rank] for rank in ranks), n)
+            self.bits_by_clues[pair] = ranks_to_bits(ranks)
+
+        all_bits = (1 << count) - 1
+        self.value_bits = []
+        self.clear_bits = []
+        for j in range(n):
+            ranks_at = [[] for x in range(n + 1)]
+            for rank, row in enumerate(perms):
+                ranks_at[row[j]].append(rank)
+            bits = [ranks_to_bits(ranks) for ranks in ranks_at]
+            self.value_bits.append(bits)
+            self.clear_bits.append([all_bits ^ b for b in bits])
+
+
+# Bitset helpers: a set of permutation ranks packed into one int.
+def ranks_to_bits(ranks):
+    bits = 0
+    for rank in ranks:
+        bits |= 1 << rank
+    return bits
+
+
+def iter_ranks(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+# Clue geometry for an n x n grid. The 4*n clues run clockwise around it:
+#   top clues    clues[0 .. n-1]     left-to-right
+#   right clues  clues[n .. 2n-1]    top-to-bottom
+#   bottom clues clues[2n .. 3n-1]   right-to-left
+#   left clues   clues[3n .. 4n-1]   bottom-to-top
+# Row r is read left-to-right, column j top-to-bottom.
+def row_clues(clues, r, n):
+    return clues[4 * n - 1 - r], clues[n + r]
+
+
+def col_clues(clues, j, n):
+    return clues[j], clues[3 * n - 1 - j]
+
+
+# Row/column arc consistency. row_bits[r] and col_bits[j] are candidate
+# bitsets; a column candidate is the permutation read top-to-bottom, so the
+# value it puts in row r is its value at position r. For every cell (r, j) a
+# value x survives only if some row-r candidate and some column-j candidate
+# both put x there; every candidate using a value that fails is dropped. This
+# repeats until nothing changes. The lists are updated in place (callers pass
+# copies) and False is returned as soon as a line runs out of candidates.
+def propagate(table, row_bits, col_bits):
+    n = table.n
+    value_bits = table.value_bits
+    for bits in row_bits:
+        if not bits:
+            return False
+    for bits in col_bits:
+        if not bits:
+            return False
+    values = range(1, n + 1)
+    changed = True
+    while changed:
+        changed = False
+        for r in range(n):
+            at_r = value_bits[r]
+            for j in range(n):
+                at_j = value_bits[j]
+                row_b = row_bits[r]
+                col_b = col_bits[j]
+                row_drop = col_drop = 0
+                for x in values:
+                    in_row = row_b & at_j[x]
+                    in_col = col_b & at_r[x]
+                    if in_row:
+                        if not in_col:
+                            row_drop |= in_row
+                    elif in_col:
+                        col_drop |= in_col
+                if row_drop:
+                    row_b ^= row_drop
+                    if not row_b:
+                        return False
+                    row_bits[r] = row_b
+                    changed = True
+                if col_drop:
+                    col_b ^= col_drop
+                    if not col_b:
+                        return False
+                    col_bits[j] = col_b
+                    changed = True
+    return True
+
+
+# Fix row r to permutation `rank`: every column must then hold row[j] at
+# position r and no other row may use row[j] in column j, which is one AND
+# per column and one AND-NOT per other row and column.
+def place_row(table, row_bits, col_bits, r, rank):
+    row = table.rows[rank]
+    value_bits = table.value_bits[r]
+    clear_bits = table.clear_bits
+    row_bits[r] = 1 << rank
+    for j, x in enumerate(row):
+        col_bits[j] &= value_bits[x]
+    for r2 in range(table.n):
+        if r2 != r:
+            bits = row_bits[r2]
+            for j, x in enumerate(row):
+                bits &= clear_bits[j][x]
+            row_bits[r2] = bits
+
+
+# Bounded nogood (transposition) table: packed integer keys of search states
+# already known to have no solution. Once it holds max_entries keys the least
+# recently used one is evicted, so memory stays predictable however large the
+# search gets. hits/misses count lookups, evictions count dropped keys.
+class TranspositionTable:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.keys = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        self.keys[key] = None
+        if len(self.keys) > self.max_entries:
+            self.keys.popitem(last=False)
+            self.evictions += 1
+
+
+# Grid size implied by a clue tuple, or a check of the size the caller passed.
+def grid_size(clues, n=None):
+    if n is None:
+        if not clues or len(clues) % 4:
+            raise ValueError("expected 4*n clues, got %d" % len(clues))
+        n = len(clues) // 4
+    if n < 1 or len(clues) != 4 * n:
+        raise ValueError("expected %d clues for a %dx%d grid, got %d"
+                         % (4 * n, n, n, len(clues)))
+    for clue in clues:
+        if not 0 <= clue <= n:
+            raise ValueError("clue %r out of range for a %dx%d grid" % (clue, n, n))
+    return n
+
+
+# Cells filled in before solving, as a list of (row, column, value). `givens`
+# is either a mapping {(row, column): value} or an n x n grid with 0 for the
+# blank cells.
+def given_cells(givens, n):
+    if givens is None:
+        return []
+    if hasattr(givens, 'items'):
+        cells = [(r, c, x) for (r, c), x in givens.items()]
+    else:
+        if len(givens) != n or any(len(row) != n for row in givens):
+            raise ValueError("givens grid must be %dx%d" % (n, n))
+        cells = [(r, c, x) for r, row in enumerate(givens) for c, x in enumerate(row) if x]
+    for r, c, x in cells:
+        if not (0 <= r < n and 0 <= c < n):
+            raise ValueError("given cell (%r, %r) outside a %dx%d grid" % (r, c, n, n))
+        if not 1 <= x <= n:
+            raise ValueError("given value %r out of range for a %dx%d grid" % (x, n, n))
+    return cells
+
+
+# Tables are built the first time somebody asks for a given size and then
+# shared by every solver in the process. If the SKYSCRAPER_TABLES environment
+# variable names a directory holding a table file for that size (written by
+# skyscraper_tables.py), it is memory-mapped instead of being built.
+_tables = {}
+_tables_lock = threading.Lock()
+
+# Largest grid Solver builds permutation tables for (n! rows, 5,040 at 7).
+# Larger puzzles are solved on per-cell domains (skyscraper_domains) unless
+# their table is already loaded or there is a table file for it.
+MAX_TABLE_N = 7
+
+
+def _table_file(n):
+    directory = os.environ.get('SKYSCRAPER_TABLES')
+    if directory:
+        from skyscraper_tables import table_path
+        path = table_path(directory, n)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _load_table(n):
+    path = _table_file(n)
+    if path is not None:
+        from skyscraper_tables import load_table
+        return load_table(path)
+    return PermTable(n)
+
+
+def has_table(n):
+    return n <= MAX_TABLE_N or n in _tables or _table_file(n) is not None
+
+
+def get_table(n):
+    table = _tables.get(n)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(n)
+            if table is None:
+                table = _tables[n] = _load_table(n)
+    return table
+
+
+# Nodes expanded between two looks at the clock (and the cancel event) when
+# run() has a time limit.
+CHECK_INTERVAL = 64
+
+
+# What solve() returns when its deadline passed or it was cancelled before
+# the search finished; None keeps meaning "no solution".
+class _TimedOut:
+    def __repr__(self):
+        return 'TIMED_OUT'
+
+
+TIMED_OUT = _TimedOut()
+
+
+# One search over the solutions of a puzzle, driven by an explicit stack
+# instead of recursion, so it can stop after any node and pick up again later.
+#
+# Rows are fixed from the edges inwards: at each step take whichever of the
+# topmost and bottommost unfixed rows has fewer candidates left. After
+# propagation every candidate agrees with some column candidate, which
+# already satisfies the column clues and holds a distinct value in each row,
+# so no further checks are needed and a grid where every row has a single
+# candidate is a solution. Every stack frame is one such step:
+#   [lo, hi, r, row_bits, col_bits, untried, key, found]
+# with the unfixed rows lo..hi before the step, the row r being fixed, the
+# candidate bitsets on entry, the candidates of row r not tried yet, the
+# nogood key of the step (or None) and whether any solution was found below.
+# The flag is also set on frames whose subtree is partly searched elsewhere
+# (see restrict, follow and split), since finding nothing in their own part
+# no longer makes the state a nogood.
+#
+# nodes counts the rows placed so far and done turns true once the search
+# space is exhausted.
+class SearchState:
+    def __init__(self, table, clues, n, nogoods=None, stats=None, givens=(), lines=None):
+        self.table = table
+        self.n = n
+        self.nogoods = nogoods
+        self.stats = stats if stats is not None else collections.Counter()
+        self.nodes = 0
+        self.done = False
+        self.stack = []
+        self.solution = None
+        self.tops = [col_clues(clues, j, n)[0] for j in range(n)]
+        self.bottoms = [col_clues(clues, j, n)[1] for j in range(n)]
+
+        # Candidate bitsets for every grid row and every column come straight
+        # from the clue-pair index, unless the caller already has them as
+        # `lines` = (row_bits, col_bits); a given x at (r, c) keeps the row-r
+        # candidates with x at position c and the column-c ones with x at
+        # position r.
+        if lines is not None:
+            row_bits, col_bits = list(lines[0]), list(lines[1])
+        else:
+            row_bits = [table.bits_by_clues[row_clues(clues, r, n)] for r in range(n)]
+            col_bits = [table.bits_by_clues[col_clues(clues, j, n)] for j in range(n)]
+        for r, c, x in givens:
+            row_bits[r] &= table.value_bits[c][x]
+            col_bits[c] &= table.value_bits[r][x]
+        if propagate(table, row_bits, col_bits):
+            self.solution = self._descend(0, n - 1, row_bits, col_bits)
+        else:
+            self.done = True
+
+    # Carry on until the next solution, which is returned as a tuple of row
+    # tuples, or until the search is over, which returns None. If max_nodes
+    # more rows have been placed, max_time seconds have passed, the
+    # time.monotonic() `deadline` is reached or the threading.Event `cancel`
+    # is set first, the state itself is returned and calling run() again
+    # resumes the search exactly where it stopped.
+    def run(self, max_nodes=None, max_time=None, deadline=None, cancel=None):
+        if self.solution is not None:
+            solution, self.solution = self.solution, None
+            return solution
+        if self.done:
+            return None
+        if max_time is not None:
+            end = time.monotonic() + max_time
+            deadline = end if deadline is None else min(deadline, end)
+        limit = None if max_nodes is None else self.nodes + max_nodes
+        nogoods = self.nogoods
+        before = (nogoods.hits, nogoods.misses, nogoods.evictions) if nogoods is not None else None
+        try:
+            return self._run(limit, deadline, cancel)
+        finally:
+            if nogoods is not None:
+                self.stats['nogood_hits'] += nogoods.hits - before[0]
+                self.stats['nogood_misses'] += nogoods.misses - before[1]
+                self.stats['nogood_evictions'] += nogoods.evictions - before[2]
+
+    # Before the first run(): the candidates of the first row the search
+    # branches on (0 if it has nothing left to branch on), and a way to limit
+    # the search to the subtrees of some of them. Splitting them into
+    # disjoint sets splits the search. After follow(), both apply to the
+    # row reached at the end of the path.
+    def branches(self):
+        return self.stack[-1][5] if self.stack else 0
+
+    def restrict(self, bits):
+        if self.stack:
+            self.stack[-1][5] &= bits
+            self.stack[-1][7] = True
+
+    # Before the first run(): go down a path handed out by split() on a
+    # search of the same puzzle, placing the given rank at each branching
+    # row in turn, without searching the siblings on the way.
+    def follow(self, path):
+        for rank in path:
+            if not self.stack:
+                break
+            frame = self.stack[-1]
+            frame[5] = 0
+            frame[7] = True
+            depth = len(self.stack)
+            self.solution = self._expand(frame, rank)
+            if len(self.stack) == depth:
+                break
+
+    # Hand part of the remaining search to somebody else: the shallowest
+    # frame with untried candidates gives away the upper half of them (the
+    # ones it would have tried last). Returns (path, bits) such that
+    # follow(path) followed by restrict(bits) on a fresh state of the same
+    # puzzle searches exactly the part given away, or None if there is
+    # nothing left to give.
+    def split(self):
+        stack = self.stack
+        for i, frame in enumerate(stack):
+            ranks = list(iter_ranks(frame[5]))
+            if ranks:
+                bits = ranks_to_bits(ranks[len(ranks) // 2:])
+                frame[5] ^= bits
+                for k in range(i + 1):
+                    stack[k][7] = True
+                # The rank being searched at frame k is the one its row was
+                # fixed to on entry to frame k + 1.
+                path = [stack[k + 1][3][stack[k][2]].bit_length() - 1 for k in range(i)]
+                return path, bits
+        return None
+
+    def _run(self, limit, deadline, cancel):
+        stack = self.stack
+        start = self.nodes
+        while stack:
+            frame = stack[-1]
+            untried = frame[5]
+            if not untried:
+                stack.pop()
+                if frame[6] is not None and not frame[7]:
+                    self.nogoods.add(frame[6])
+                continue
+            if limit is not None and self.nodes >= limit:
+                return self
+            if (self.nodes - start) % CHECK_INTERVAL == 0:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return self
+                if cancel is not None and cancel.is_set():
+                    return self
+            low = untried & -untried
+            frame[5] = untried ^ low
+            solution = self._expand(frame, low.bit_length() - 1)
+            if solution is not None:
+                for frame in stack:
+                    frame[7] = True
+                return solution
+        self.done = True
+        return None
+
+    # Place `rank` in the frame's row and move on as _descend does; returns
+    # the grid if that completes it.
+    def _expand(self, frame, rank):
+        lo, hi, r, row_bits, col_bits = frame[:5]
+        self.nodes += 1
+        new_rows = list(row_bits)
+        new_cols = list(col_bits)
+        place_row(self.table, new_rows, new_cols, r, rank)
+        if not propagate(self.table, new_rows, new_cols):
+            return None
+        next_lo, next_hi = (lo + 1, hi) if r == lo else (lo, hi - 1)
+        return self._descend(next_lo, next_hi, new_rows, new_cols)
+
+    # Move inwards from the unfixed rows lo..hi, skipping rows that are
+    # already down to one candidate. Returns the grid if every row is fixed;
+    # otherwise pushes a frame for the next row to branch on (unless the
+    # nogood table already knows the state is a dead end) and returns None.
+    def _descend(self, lo, hi, row_bits, col_bits):
+        while lo <= hi:
+            r = lo if row_bits[lo].bit_count() <= row_bits[hi].bit_count() else hi
+            if row_bits[r] & (row_bits[r] - 1) == 0:
+                lo, hi = (lo + 1, hi) if r == lo else (lo, hi - 1)
+                continue
+            key = None
+            if self.nogoods is not None:
+                key = self.nogood_key(lo, hi, row_bits)
+                if key in self.nogoods:
+                    return None
+            self.stack.append([lo, hi, r, row_bits, col_bits, row_bits[r], key, False])
+            return None
+        rows = self.table.rows
+        return tuple(rows[bits.bit_length() - 1] for bits in row_bits)
+
+    # Rows above lo and below hi are fixed, so whether the rows in between can
+    # be completed depends only on:
+    #   - lo and hi,
+    #   - the values already used in every column (the middle of column j
+    #     must hold exactly the others),
+    #   - per column and clue, the tallest fixed building on that clue's side,
+    #     and how many more skyscrapers the middle has to show above it: the
+    #     clue minus those visible in the fixed part on that side, minus those
+    #     visible in the fixed part on the far side (which is scanned after
+    #     the middle, whose tallest value is known).
+    # These are packed into one integer, the key of the nogood table.
+    def nogood_key(self, lo, hi, row_bits):
+        n = self.n
+        rows = self.table.rows
+        masks = self.table.masks
+        full = (1 << n) - 1
+        width = (n + 1) * (2 * n + 2)
+        above = [row_bits[r].bit_length() - 1 for r in range(lo)]
+        below = [row_bits[r].bit_length() - 1 for r in range(n - 1, hi, -1)]
+        used = 0
+        for rank in above + below:
+            used |= masks[rank]
+        above = [rows[rank] for rank in above]
+        below = [rows[rank] for rank in below]
+        key = lo * (n + 1) + hi + 1
+        for j in range(n):
+            middle_max = (full & ~(used >> (j * n))).bit_length()
+            key = key * width + self.need(self.tops[j], above, below[::-1], j, middle_max)
+            key = key * width + self.need(self.bottoms[j], below, above[::-1], j, middle_max)
+        return key << (n * n) | used
+
+    # (tallest on the near side, skyscrapers the middle still has to show)
+    # packed for one clue; near/far are the fixed rows on each side, both
+    # listed from the clue's edge inwards.
+    def need(self, clue, near, far, j, middle_max):
+        if not clue:
+            return 0
+        n = self.n
+        tallest = seen = 0
+        for row in near:
+            if row[j] > tallest:
+                tallest = row[j]
+                seen += 1
+        top = tallest
+        tallest = max(tallest, middle_max)
+        for row in far:
+            if row[j] > tallest:
+                tallest = row[j]
+                seen += 1
+        return top * (2 * n + 2) + clue - seen + n + 1
+
+
+# A reusable solver: it holds on to the shared permutation tables, so solving
+# thousands of puzzles pays the table setup only once per grid size.
+#
+# Every search gets its own TranspositionTable of at most nogood_size entries
+# (0 turns it off); stats adds up its counters over all searches.
+class Solver:
+    def __init__(self, nogood_size=1 << 16):
+        self.tables = {}
+        self.nogood_size = nogood_size
+        self.stats = collections.Counter()
+
+    def table(self, n):
+        table = self.tables.get(n)
+        if table is None:
+            table = self.tables[n] = get_table(n)
+        return table
+
+    # A fresh search over the puzzle's solutions that can be run in slices;
+    # see SearchState.
+    # `givens` are cells filled in beforehand, see given_cells. Grids without
+    # a permutation table (see has_table) get a skyscraper_domains state,
+    # which runs the same way.
+    def start(self, clues, n=None, givens=None):
+        n = grid_size(clues, n)
+        if not has_table(n):
+            from skyscraper_domains import DomainState
+            return DomainState(clues, n, given_cells(givens, n))
+        nogoods = TranspositionTable(self.nogood_size) if self.nogood_size else None
+        return SearchState(self.table(n), clues, n, nogoods, self.stats,
+                           given_cells(givens, n))
+
+    # Lazily yield every solution of the puzzle, as tuples of row tuples.
+    def iter_solutions(self, clues, n=None, givens=None):
+        return self._iterate(self.start(clues, n, givens))
+
+    def _iterate(self, state):
+        while True:
+            solution = state.run()
+            if solution is None:
+                return
+            yield solution
+
+    # First solution found, or None if there is none.
+    # With a time.monotonic() `deadline` or a threading.Event `cancel`,
+    # TIMED_OUT is returned if the search is cut short.
+    def solve(self, clues, n=None, deadline=None, cancel=None, givens=None):
+        state = self.start(clues, n, givens)
+        solution = state.run(deadline=deadline, cancel=cancel)
+        return TIMED_OUT if solution is state else solution
+
+    # Number of solutions, counting no further than `limit` if given:
+    # count_solutions(clues, limit=2) == 1 means the puzzle is unique.
+    def count_solutions(self, clues, n=None, limit=None, givens=None):
+        count = 0
+        for _ in self.iter_solutions(clues, n, givens):
+            count += 1
+            if count == limit:
+                break
+        return count
+
+
+_solver = None
+
+
+def default_solver():
+    global _solver
+    if _solver is None:
+        _solver = Solver()
+    return _solver
+
+
+# If the SKYSCRAPER_STORE environment variable names a sqlite file (see
+# skyscraper_cache.SolutionStore), solve_puzzle and the batch helpers below
+# look puzzles up there before searching and add the ones they solve.
+_store_solvers = {}
+
+
+def _store_path():
+    return os.environ.get('SKYSCRAPER_STORE') or None
+
+
+# The default solver, behind a CachedSolver on the SKYSCRAPER_STORE file when
+# that is set.
+def _stored_solver():
+    path = _store_path()
+    if path is None:
+        return default_solver()
+    solver = _store_solvers.get(path)
+    if solver is None:
+        from skyscraper_cache import CachedSolver, SolutionStore
+        solver = _store_solvers.setdefault(
+            path, CachedSolver(default_solver(), store=SolutionStore(path)))
+    return solver
+
+
+# Solve a skyscraper puzzle given its 4*n clues; n defaults to len(clues) // 4.
+# Returns TIMED_OUT instead if `deadline` (a time.monotonic() value) passes or
+# the threading.Event `cancel` is set before the search is done. `givens`
+# pre-fills cells: {(row, column): value}, or an n x n grid with 0 for blanks.
+# Puzzles without givens go through the SKYSCRAPER_STORE store, if any.
+def solve_puzzle(clues, n=None, deadline=None, cancel=None, givens=None):
+    if givens is None:
+        return _stored_solver().solve(clues, n, deadline, cancel)
+    return default_solver().solve(clues, n, deadline, cancel, givens)
+
+
+def iter_solutions(clues, n=None, givens=None):
+    return default_solver().iter_solutions(clues, n, givens)
+
+
+def count_solutions(clues, n=None, limit=None, givens=None):
+    return default_solver().count_solutions(clues, n, limit, givens)
+
+
+# A puzzle being edited one clue at a time, e.g. in an authoring tool.
+# The session keeps the candidate bitsets straight from the clues for every
+# row and column, and the same bitsets after propagation. Setting a clue
+# recomputes the one line it belongs to. A clue going from blank to a value
+# only removes candidates, so the propagated state is narrowed in place;
+# any other edit means starting over from the clue bitsets. Propagation and
+# search wait until a solution is actually needed: the last solution is
+# returned again while it still fits the edited line, which is the common
+# case when clues are being added. Sizes without a permutation table (see
+# has_table) keep no bitsets: edits that break the last solution re-solve
+# from scratch on the cell-domain backend rather than building the table.
+class SolverSession:
+    def __init__(self, clues, n=None, solver=None):
+        self.solver = solver or default_solver()
+        self.n = grid_size(clues, n)
+        self.clues = list(clues)
+        n = self.n
+        if has_table(n):
+            self.table = self.solver.table(n)
+            self.clue_rows = [self.table.bits_by_clues[row_clues(self.clues, r, n)] for r in range(n)]
+            self.clue_cols = [self.table.bits_by_clues[col_clues(self.clues, j, n)] for j in range(n)]
+        else:
+            self.table = None
+        self.row_bits = self.col_bits = None
+        self.consistent = True
+        self.narrowed = False
+        self.solution = None
+        self.solve()
+
+    # ('row', r) or ('col', j) for the line clue `index` is on, the clue
+    # ring running clockwise from the top-left corner.
+    def line_of(self, index):
+        n = self.n
+        side, k = divmod(index, n)
+        if side == 0:
+            return 'col', k
+        if side == 1:
+            return 'row', k
+        if side == 2:
+            return 'col', n - 1 - k
+        return 'row', n - 1 - k
+
+    # Set clue `index` to `value` (0 clears it) and return a solution of the
+    # edited puzzle, or None if it has none.
+    def set_clue(self, index, value):
+        n = self.n
+        if not 0 <= index < 4 * n:
+            raise ValueError("clue index %r out of range for a %dx%d grid" % (index, n, n))
+        if not 0 <= value <= n:
+            raise ValueError("clue %r out of range for a %dx%d grid" % (value, n, n))
+        old = self.clues[index]
+        if value == old:
+            return self.solution
+        self.clues[index] = value
+        kind, k = self.line_of(index)
+        if kind == 'row':
+            line = self.solution[k] if self.solution else None
+        else:
+            line = tuple(row[k] for row in self.solution) if self.solution else None
+
+        if self.table is not None:
+            if kind == 'row':
+                bits = self.clue_rows[k] = self.table.bits_by_clues[row_clues(self.clues, k, n)]
+            else:
+                bits = self.clue_cols[k] = self.table.bits_by_clues[col_clues(self.clues, k, n)]
+            if old == 0 and self.row_bits is not None:
+                if kind == 'row':
+                    self.row_bits[k] &= bits
+                else:
+                    self.col_bits[k] &= bits
+                self.narrowed = True
+            else:
+                self.row_bits = self.col_bits = None
+
+        # The other lines are no stricter than before, so the last solution
+        # still works if the edited line does.
+        if line is not None and (not value or visible_from(line, index, n) == value):
+            return self.solution
+        self.solution = None
+        return self.solve()
+
+    def clear_clue(self, index):
+        return self.set_clue(index, 0)
+
+    def solve(self):
+        if self.solution is not None:
+            return self.solution
+        if self.table is None:
+            self.solution = self.solver.solve(self.clues, self.n)
+            return self.solution
+        if self.row_bits is None:
+            self.row_bits = list(self.clue_rows)
+            self.col_bits = list(self.clue_cols)
+            self.consistent = propagate(self.table, self.row_bits, self.col_bits)
+        elif self.narrowed and self.consistent:
+            # Narrowing an unsolvable puzzle keeps it unsolvable.
+            self.consistent = propagate(self.table, self.row_bits, self.col_bits)
+        self.narrowed = False
+        if self.consistent:
+            size = self.solver.nogood_size
+            nogoods = TranspositionTable(size) if size else None
+            state = SearchState(self.table, self.clues, self.n, nogoods, self.solver.stats,
+                                lines=(self.row_bits, self.col_bits))
+            self.solution = state.run()
+        return self.solution
+
+
+# Skyscrapers seen by clue `index` looking along `line`, a row read left to
+# right or a column read top to bottom.
+def visible_from(line, index, n):
+    side = index // n
+    return visible(line if side in (0, 3) else line[::-1])
+
+
+# Batch solving. Every pool worker keeps one Solver, so its tables are built
+# once per process, not once per puzzle or per chunk. With a store path the
+# solver sits behind a skyscraper_cache.CachedSolver backed by that sqlite
+# file, so puzzles solved by any worker, in this run or an earlier one, are
+# not searched again. The store path defaults to SKYSCRAPER_STORE.
+_worker_solver = None
+
+
+def _make_solver(store=None):
+    if store is None:
+        store = _store_path()
+    if store is None:
+        return Solver()
+    from skyscraper_cache import CachedSolver, SolutionStore
+    return CachedSolver(Solver(), store=SolutionStore(store))
+
+
+def _init_worker(store=None):
+    global _worker_solver
+    _worker_solver = _make_solver(store)
+
+
+def _solve_chunk(start, chunk):
+    return start, [_worker_solver.solve(clues) for clues in chunk]
+
+
+# One puzzle on a pool worker, or on the default solver (with the
+# SKYSCRAPER_STORE store, if any) when called from a thread of this process.
+def _solve_one(clues, deadline=None):
+    return (_worker_solver or _stored_solver()).solve(clues, deadline=deadline)
+
+
+# Cut an iterable of puzzles into (start index, list of puzzles) chunks
+# without reading more of it than one chunk at a time.
+def _chunks(puzzles, chunksize):
+    it = iter(puzzles)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(it, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+# Solve many puzzles on a pool of `workers` processes (os.cpu_count() by
+# default). Puzzles are sent in chunks of `chunksize` to cut IPC overhead, and
+# the input is read lazily with at most two chunks per worker in flight, so
+# it can be an arbitrarily long iterator. With ordered=True the solutions are
+# yielded in input order; with ordered=False (index, solution) pairs are
+# yielded as soon as their chunk is done. workers=1 solves in this process.
+# `store` is an optional path to a shared on-disk solution store.
+def solve_many(puzzles, workers=None, chunksize=64, ordered=True, store=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        solver = _make_solver(store)
+        for index, clues in enumerate(puzzles):
+            solution = solver.solve(clues)
+            yield solution if ordered else (index, solution)
+        return
+
+    max_pending = 2 * workers
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(store,))
+    try:
+        if ordered:
+            pending = collections.deque()
+            for start, chunk in _chunks(puzzles, chunksize):
+                pending.append(pool.submit(_solve_chunk, start, chunk))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()[1]
+            while pending:
+                yield from pending.popleft().result()[1]
+        else:
+            pending = set()
+            chunks = _chunks(puzzles, chunksize)
+            for start, chunk in chunks:
+                pending.add(pool.submit(_solve_chunk, start, chunk))
+                if len(pending) >= max_pending:
+                    break
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, solutions = future.result()
+                    yield from enumerate(solutions, start)
+                for start, chunk in itertools.islice(chunks, len(done)):
+                    pending.add(pool.submit(_solve_chunk, start, chunk))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Parallel search for one hard puzzle. The candidates of the first row the
+# search branches on are cut into `chunks` runs of consecutive ranks (four
+# per worker by default) and every run is searched in its own pool task. The
+# sequential search tries ranks in increasing order, so the solution it
+# returns is the first one of the lowest run that has any: once run k finds
+# one, runs above k are cancelled (queued ones never start, running ones stop
+# at their next cancel check) and the answer is known as soon as every run
+# below k is done. The tables are built before the pool is started so forked
+# workers inherit them.
+_best_branch = None
+
+
+class _BranchCancel:
+    def __init__(self, index):
+        self.index = index
+
+    def is_set(self):
+        return _best_branch.value < self.index
+
+
+def _init_branch_worker(best):
+    global _best_branch
+    _best_branch = best
+    _init_worker()
+
+
+def _solve_branch(clues, index, bits):
+    state = _worker_solver.start(clues)
+    state.restrict(bits)
+    solution = state.run(cancel=_BranchCancel(index))
+    if solution is state:
+        return index, None
+    if solution is not None:
+        with _best_branch.get_lock():
+            if index < _best_branch.value:
+                _best_branch.value = index
+    return index, solution
+
+
+def solve_parallel(clues, n=None, workers=None, chunks=None):
+    n = grid_size(clues, n)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    state = Solver().start(clues, n)
+    ranks = list(iter_ranks(state.branches()))
+    if workers <= 1 or len(ranks) < 2:
+        return state.run()
+
+    chunks = min(chunks or 4 * workers, len(ranks))
+    parts = []
+    for k in range(chunks):
+        parts.append(ranks_to_bits(ranks[k * len(ranks) // chunks:(k + 1) * len(ranks) // chunks]))
+
+    best = multiprocessing.Value('i', chunks)
+    solutions = [None] * chunks
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_branch_worker,
+                               initargs=(best,))
+    try:
+        pending = {pool.submit(_solve_branch, clues, k, bits): k for k, bits in enumerate(parts)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                index, solution = future.result()
+                solutions[index] = solution
+            for future, k in list(pending.items()):
+                if k > best.value and future.cancel():
+                    del pending[future]
+            if all(k > best.value for k in pending.values()):
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return solutions[best.value] if best.value < chunks else None
+
+
+# Work-stealing search for very hard puzzles. Each worker process runs one
+# task at a time, a task being a part of the search tree given as (path,
+# bits) by SearchState.split(), and runs it in slices of CHECK_INTERVAL
+# nodes. Between slices, if some worker is idle and the shared queue is
+# empty, it splits off the shallowest untried branches of its own stack
+# (the biggest pieces of work it has) and puts them on the queue, from which
+# idle workers take them. `pending` counts tasks handed out and not finished
+# yet; once it drops to zero with nothing queued the search is over. In
+# first-solution mode the first solution found by any worker stops them
+# all, so which of several solutions comes back is not fixed; in counting
+# mode every worker reports how many solutions its tasks held.
+def _steal_worker(clues, first, tasks, results, idle, pending, stop):
+    solver = Solver()
+    count = 0
+    while not stop.is_set():
+        with idle.get_lock():
+            idle.value += 1
+        try:
+            path, bits = tasks.get(timeout=0.05)
+        except queue.Empty:
+            with idle.get_lock():
+                idle.value -= 1
+            if pending.value == 0:
+                break
+            continue
+        with idle.get_lock():
+            idle.value -= 1
+
+        state = solver.start(clues)
+        state.follow(path)
+        state.restrict(bits)
+        while True:
+            result = state.run(max_nodes=CHECK_INTERVAL, cancel=stop)
+            if result is state:
+                if stop.is_set():
+                    break
+                if idle.value and tasks.empty():
+                    task = state.split()
+                    if task is not None:
+                        with pending.get_lock():
+                            pending.value += 1
+                        tasks.put(task)
+                continue
+            if result is None:
+                break
+            count += 1
+            if first:
+                results.put(('solution', result))
+                stop.set()
+                break
+        with pending.get_lock():
+            pending.value -= 1
+    results.put(('count', count))
+
+
+def _steal(clues, n, workers, first):
+    n = grid_size(clues, n)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    state = Solver().start(clues, n)
+    if workers <= 1 or state.branches().bit_count() < 2:
+        if first:
+            return state.run()
+        return sum(1 for _ in default_solver()._iterate(state))
+
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    idle = multiprocessing.Value('i', 0)
+    pending = multiprocessing.Value('i', 1)
+    stop = multiprocessing.Event()
+    tasks.put(((), state.branches()))
+    procs = [multiprocessing.Process(target=_steal_worker,
+                                     args=(clues, first, tasks, results, idle, pending, stop))
+             for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    solution = None
+    count = 0
+    try:
+        # Every worker sends exactly one ('count', ...) message when it stops.
+        finished = 0
+        while finished < workers:
+            kind, value = results.get()
+            if kind == 'solution':
+                if solution is None:
+                    solution = value
+            else:
+                count += value
+                finished += 1
+    finally:
+        stop.set()
+        for proc in procs:
+            proc.join()
+    return solution if first else count
+
+
+# A solution of the puzzle found by `workers` processes stealing work from
+# each other, or None.
+def solve_work_stealing(clues, n=None, workers=None):
+    return _steal(clues, n, workers, True)
+
+
+# Number of solutions of the puzzle, counted by `workers` processes.
+def count_work_stealing(clues, n=None, workers=None):
+    return _steal(clues, n, workers, False)
+
+
+# --- Local testing ---
+if __name__ == '__main__':
+    # Puzzle 1
+    puzzle1_clues = (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4)
+    expected1 = (
+        (2, 1, 4, 3, 5, 6),
+        (1, 6, 3, 2, 4, 5),
+        (4, 3, 6, 5, 1, 2),
+        (6, 5, 2, 1, 3, 4),
+        (5, 4, 1, 6, 2, 3),
+        (3, 2, 5, 4, 6, 1)
+    )
+    sol1 = solve_puzzle(puzzle1_clues)
+    print("Puzzle 1 solution:")
+    for row in sol1:
+        print(row)
+    assert sol1 == expected1
+
+    # Puzzle 2
+    puzzle2_clues = (0,0,0,2,2,0, 0,0,0,6,3,0, 0,4,0,0,0,0, 4,4,0,3,0,0)
+    expected2 = (
+        (5, 6, 1, 4, 3, 2),
+        (4, 1, 3, 2, 6, 5),
+        (2, 3, 6, 1, 5, 4),
+        (6, 5, 4, 3, 2, 1),
+        (1, 2, 5, 6, 4, 3),
+        (3, 4, 2, 5, 1, 6)
+    )
+    sol2 = solve_puzzle(puzzle2_clues)
+    print("\nPuzzle 2 solution:")
+    for row in sol2:
+        print(row)
+    assert sol2 == expected2
+
+    # Puzzle 3
+    puzzle3_clues = (0,3,0,5,3,4, 0,0,0,0,0,1, 0,3,0,3,2,3, 3,2,0,3,1,0)
+    expected3 = (
+        (5, 2, 6, 1, 4, 3),
+        (6, 4, 3, 2, 5, 1),
+        (3, 1, 5, 4, 6, 2),
+        (2, 6, 1, 5, 3, 4),
+        (4, 3, 2, 6, 1, 5),
+        (1, 5, 4, 3, 2, 6)
+    )
+    sol3 = solve_puzzle(puzzle3_clues)
+    print("\nPuzzle 3 solution:")
+    for row in sol3:
+        print(row)
+    assert sol3 == expected3
+
+    # Puzzle 4 (4x4)
+    puzzle4_clues = (2,2,1,3, 2,2,3,1, 1,2,2,3, 3,2,1,3)
+    expected4 = (
+        (1, 3, 4, 2),
+        (4, 2, 1, 3),
+        (3, 4, 2, 1),
+        (2, 1, 3, 4)
+    )
+    sol4 = solve_puzzle(puzzle4_clues)
+    print("\nPuzzle 4 solution:")
+    for row in sol4:
+        print(row)
+    assert sol4 == expected4
+
+    # Puzzle 5 (7x7)
+    puzzle5_clues = (7,0,0,0,2,2,3, 0,0,3,0,0,0,0, 3,0,3,0,0,5,0, 0,0,0,0,5,0,4)
+    expected5 = (
+        (1, 5, 6, 7, 4, 3, 2),
+        (2, 7, 4, 5, 3, 1, 6),
+        (3, 4, 5, 6, 7, 2, 1),
+        (4, 6, 3, 1, 2, 7, 5),
+        (5, 3, 1, 2, 6, 4, 7),
+        (6, 2, 7, 3, 1, 5, 4),
+        (7, 1, 2, 4, 5, 6, 3)
+    )
+    sol5 = solve_puzzle(puzzle5_clues)
+    print("\nPuzzle 5 solution:")
+    for row in sol5:
+        print(row)
+    assert sol5 == expected5
+
+    # Past MAX_TABLE_N the cell-domain backend takes over. This 9x9 has more
+    # than one solution, so check the one found against the clues.
+    puzzle9_clues = (3,3,4,3,1,3,2,2,5, 3,2,3,2,3,2,3,1,4, 2,3,2,2,4,3,1,4,4, 2,3,4,4,2,1,2,3,3)
+    sol9 = solve_puzzle(puzzle9_clues)
+    print("\nPuzzle 9x9 solution:")
+    for row in sol9:
+        print(row)
+    cols9 = [tuple(row[j] for row in sol9) for j in range(9)]
+    for k in range(9):
+        assert sorted(sol9[k]) == sorted(cols9[k]) == list(range(1, 10))
+        left, right = row_clues(puzzle9_clues, k, 9)
+        top, bottom = col_clues(puzzle9_clues, k, 9)
+        assert (visible(sol9[k]), visible(sol9[k][::-1])) == (left, right)
+        assert (visible(cols9[k]), visible(cols9[k][::-1])) == (top, bottom)
+
+    # Uniqueness checks and counting.
+    assert count_solutions(puzzle2_clues, limit=2) == 1
+    assert count_solutions((0,) * 16) == 576  # every 4x4 latin square
+    assert Solver(nogood_size=0).count_solutions((0,) * 16) == 576
+    assert next(iter_solutions(puzzle3_clues)) == expected3
+
+    # Givens, sparse or as a grid, pick one of many solutions.
+    assert count_solutions((0,) * 16, givens={(0, 0): 1, (1, 1): 1, (2, 2): 1}) == 24
+    givens = [[0] * 6 for _ in range(6)]
+    givens[2][3] = expected3[2][3]
+    assert solve_puzzle(puzzle3_clues, givens=givens) == expected3
+    assert solve_puzzle(puzzle3_clues, givens={(2, 3): 1 + expected3[2][3] % 6}) is None
+
+    # Searches run in slices pick up where they stopped.
+    state = default_solver().start(puzzle5_clues)
+    slices = 0
+    while True:
+        result = state.run(max_nodes=1)
+        if result is not state:
+            break
+        slices += 1
+    assert result == expected5 and slices == state.nodes
+    assert state.run(max_time=10) is None and state.done
+
+    # Deadlines and cancellation give TIMED_OUT, not "no solution".
+    empty7 = (0,) * 28
+    assert solve_puzzle(empty7, deadline=time.monotonic() - 1) is TIMED_OUT
+    cancel = threading.Event()
+    assert solve_puzzle(empty7, cancel=cancel) is not None
+    cancel.set()
+    assert solve_puzzle(empty7, cancel=cancel) is TIMED_OUT
+
+    # A search split across processes finds the same solution.
+    assert solve_parallel(puzzle5_clues, workers=2) == expected5
+    assert solve_parallel((0,) * 24, workers=2) == solve_puzzle((0,) * 24)
+
+    # So does work stealing, and it counts what the sequential search counts.
+    assert solve_work_stealing(puzzle5_clues, workers=2) == expected5
+    assert count_work_stealing((0,) * 16, workers=3) == 576
+
+    # An edited puzzle re-solves to what solving it afresh gives.
+    session = SolverSession((0,) * 24)
+    for i, clue in enumerate(puzzle1_clues):
+        session.set_clue(i, clue)
+    assert session.solve() == expected1
+    session.clear_clue(0)
+    assert count_solutions(session.clues, givens=session.solve(), limit=2) == 1
+    session.set_clue(0, 6)
+    assert session.solve() is None
+
+    # Past the table sizes a session re-solves on the cell-domain backend and
+    # never builds the 9x9 permutation table.
+    session9 = SolverSession(puzzle9_clues)
+    assert session9.solve() == sol9
+    assert session9.clear_clue(0) == sol9
+    assert session9.set_clue(0, 9) is None
+    assert session9.set_clue(0, 3) == sol9
+    assert not has_table(9)
+
+    # Batch solving, in order and as completed.
+    puzzles = [puzzle1_clues, puzzle2_clues, puzzle3_clues, puzzle4_clues, puzzle5_clues]
+    expected = [expected1, expected2, expected3, expected4, expected5]
+    assert list(solve_many(puzzles, workers=2, chunksize=2)) == expected
+    assert sorted(solve_many(puzzles, workers=2, chunksize=2, ordered=False)) == list(enumerate(expected))
+
+    print("\nAll sample tests passed!")
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from skyscraper import TIMED_OUT, _init_worker, _solve_one, pack_grid, unpack_grid
+from skyscraper_cache import canonical, untransform_grid
+
+# asyncio front end for the solver. Searches run on an executor so the event
+# loop never blocks on one, at most max_concurrency of them at a time; the
+# rest wait their turn on a semaphore. Requests are keyed on their canonical
+# clues (see skyscraper_cache), and a request arriving while the same key is
+# already being solved awaits that search instead of starting another, which
+# also covers rotated and mirrored copies of the puzzle.
+#
+#   async with AsyncSolver(workers=4) as solver:
+#       grid = await solver.solve(clues)
+
+
+# Puzzles are solved on `executor` if given (a thread or process pool, left
+# to the caller to shut down), otherwise on a process pool of `workers`
+# processes owned by the solver. max_concurrency defaults to the number of
+# workers. With a `timeout` in seconds a search that runs longer gives
+# TIMED_OUT (see skyscraper.solve_puzzle).
+#
+# Counters: requests and coalesced (requests that joined a running search),
+# searches started and completed, and the current and peak queue depth
+# (searches waiting for a slot). metrics() returns them as a dict.
+class AsyncSolver:
+    def __init__(self, executor=None, max_concurrency=None, workers=None, timeout=None):
+        workers = workers or os.cpu_count() or 1
+        self.owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self.executor = executor
+        self.max_concurrency = max_concurrency or workers
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = {}
+        self.requests = self.coalesced = self.searches = self.completed = 0
+        self.waiting = self.running = self.max_waiting = 0
+
+    def metrics(self):
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'searches': self.searches,
+            'completed': self.completed,
+            'in_flight': len(self.in_flight),
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'running': self.running,
+        }
+
+    async def solve(self, clues, n=None):
+        key, sym = canonical(clues, n)
+        self.requests += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._search(key))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded, so a caller giving up does not cancel the search for the
+        # others waiting on it.
+        solution = await asyncio.shield(task)
+        if solution is None or solution is TIMED_OUT:
+            return solution
+        return unpack_grid(untransform_grid(pack_grid(solution), sym), len(key) // 4)
+
+    async def _search(self, key):
+        self.searches += 1
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            deadline = None if self.timeout is None else time.monotonic() + self.timeout
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _solve_one, key, deadline)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.slots.release()
+
+    async def close(self):
+        if self.owns_executor:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# --- Local testing ---
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+
+    from skyscraper import solve_puzzle
+    from skyscraper_cache import symmetries
+
+    puzzle_clues = (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4)
+    other_clues = (0,0,0,2,2,0, 0,0,0,6,3,0, 0,4,0,0,0,0, 4,4,0,3,0,0)
+
+    async def burst(solver):
+        # Ten copies of a puzzle in all its orientations and one other
+        # puzzle arrive at once: two searches, the rest coalesced.
+        batch = [tuple(puzzle_clues[i] for i in sym[0]) for sym in symmetries(6)] * 10
+        batch.append(other_clues)
+        results = await asyncio.gather(*(solver.solve(clues) for clues in batch))
+        for clues, grid in zip(batch, results):
+            assert grid == solve_puzzle(clues)
+        return solver.metrics()
+
+    async def main():
+        with ThreadPoolExecutor(2) as executor:
+            metrics = await burst(AsyncSolver(executor, max_concurrency=1))
+        print(metrics)
+        assert metrics['searches'] == 2 and metrics['coalesced'] == 79
+        assert metrics['max_waiting'] == 1 and metrics['in_flight'] == 0
+
+        async with AsyncSolver(workers=2) as solver:
+            metrics = await burst(solver)
+        assert metrics['searches'] == 2
+
+    asyncio.run(main())
+    print("\nAll sample tests passed!")
@@ -0,0 +1,206 @@
+import collections
+import functools
+import os
+import sqlite3
+import threading
+
+from skyscraper import TIMED_OUT, default_solver, grid_size, pack_grid, unpack_grid
+
+# Solution cache in front of the solver. Rotating or mirroring a grid
+# permutes its clue ring, so the 8 symmetries of the square map a puzzle onto
+# up to 8 clue tuples with the same solution up to that symmetry. The cache is
+# keyed on the smallest of them (the canonical clues), which lets repeated
+# and mirrored puzzles share one entry.
+
+
+# The 8 symmetries of an n x n puzzle as pairs of index permutations
+# (clue_perm, cell_perm): transformed clues are clues[clue_perm[i]], and the
+# transformed grid, flattened row-major, is cells[cell_perm[k]]. Generated
+# from a quarter turn clockwise, which moves the left clues to the top
+# (new[i] = old[i - n]), and a left-right mirror (new[i] = old[n - 1 - i]).
+@functools.lru_cache(maxsize=None)
+def symmetries(n):
+    size = 4 * n
+    turn_clues = [(i - n) % size for i in range(size)]
+    turn_cells = [(n - 1 - c) * n + r for r in range(n) for c in range(n)]
+    mirror_clues = [(n - 1 - i) % size for i in range(size)]
+    mirror_cells = [r * n + (n - 1 - c) for r in range(n) for c in range(n)]
+
+    def compose(first, then):
+        return [first[k] for k in then]
+
+    result = []
+    clue_perm, cell_perm = list(range(size)), list(range(n * n))
+    for _ in range(4):
+        result.append((tuple(clue_perm), tuple(cell_perm)))
+        result.append((tuple(compose(clue_perm, mirror_clues)),
+                       tuple(compose(cell_perm, mirror_cells))))
+        clue_perm = compose(clue_perm, turn_clues)
+        cell_perm = compose(cell_perm, turn_cells)
+    return result
+
+
+# (canonical clues, symmetry) where symmetry is an entry of symmetries(n)
+# that maps `clues` onto the canonical (lexicographically smallest) form.
+def canonical(clues, n=None):
+    n = grid_size(clues, n)
+    best = None
+    for sym in symmetries(n):
+        transformed = tuple(clues[i] for i in sym[0])
+        if best is None or transformed < best[0]:
+            best = (transformed, sym)
+    return best
+
+
+# Map a packed grid (see skyscraper.pack_grid) solved in canonical orientation
+# back onto the orientation the symmetry was taken from (the inverse of its
+# cell permutation).
+def untransform_grid(cells, sym):
+    original = bytearray(len(cells))
+    for k, src in enumerate(sym[1]):
+        original[src] = cells[k]
+    return bytes(original)
+
+
+# Persistent solution store in an sqlite file, shared by every process that
+# opens the same path. Keys are canonical clue tuples, values the solved grid
+# packed row-major into one byte per cell (NULL for "no solution"). The file
+# runs in WAL mode so readers never block each other or the writer; every
+# process and thread gets its own connection, opened on first use.
+class SolutionStore:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS solutions (clues BLOB PRIMARY KEY, grid BLOB)")
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    # (True, packed grid or None) if the puzzle is stored, else (False, None).
+    def lookup(self, clues):
+        row = self.connection().execute(
+            "SELECT grid FROM solutions WHERE clues = ?", (bytes(clues),)).fetchone()
+        if row is None:
+            return False, None
+        if row[0] is None:
+            return True, None
+        return True, bytes(row[0])
+
+    # `cells` is a packed grid, or None for "no solution".
+    def add(self, clues, cells):
+        self.connection().execute(
+            "INSERT OR IGNORE INTO solutions (clues, grid) VALUES (?, ?)", (bytes(clues), cells))
+
+
+# Cache of solved grids in front of a solver (default: the module-level
+# one). Up to max_entries canonical puzzles are kept in memory as packed
+# grids, least recently used first out; unsolvable puzzles are cached too.
+# With a SolutionStore, memory misses are looked up there before searching
+# and new solutions are written back. hits / store_hits / misses count lookups.
+# A search cut short by `deadline` or `cancel` (see skyscraper.solve_puzzle)
+# returns TIMED_OUT and leaves nothing behind.
+class CachedSolver:
+    def __init__(self, solver=None, max_entries=10000, store=None):
+        self.solver = solver or default_solver()
+        self.max_entries = max_entries
+        self.store = store
+        self.entries = collections.OrderedDict()
+        self.hits = self.store_hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def hit_rate(self):
+        total = self.hits + self.store_hits + self.misses
+        return (self.hits + self.store_hits) / total if total else 0.0
+
+    def solve(self, clues, n=None, deadline=None, cancel=None):
+        key, sym = canonical(clues, n)
+        with self.lock:
+            found = key in self.entries
+            if found:
+                self.entries.move_to_end(key)
+                solution = self.entries[key]
+                self.hits += 1
+        if not found:
+            if self.store is not None:
+                found, solution = self.store.lookup(key)
+            if not found:
+                if deadline is None and cancel is None:
+                    solution = self.solver.solve(key)
+                else:
+                    solution = self.solver.solve(key, deadline=deadline, cancel=cancel)
+                if solution is TIMED_OUT:
+                    return TIMED_OUT
+                if solution is not None:
+                    solution = pack_grid(solution)
+                if self.store is not None:
+                    self.store.add(key, solution)
+            with self.lock:
+                if found:
+                    self.store_hits += 1
+                else:
+                    self.misses += 1
+                self.entries[key] = solution
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        if solution is None:
+            return None
+        return unpack_grid(untransform_grid(solution, sym), len(key) // 4)
+
+
+# --- Local testing ---
+if __name__ == '__main__':
+    from skyscraper import solve_puzzle
+
+    puzzle_clues = (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4)
+    expected = solve_puzzle(puzzle_clues)
+    cache = CachedSolver()
+
+    # Every rotation and reflection of the puzzle solves to the matching
+    # rotation or reflection of its grid, and only the first one is a miss.
+    for clue_perm, cell_perm in symmetries(6):
+        clues = tuple(puzzle_clues[i] for i in clue_perm)
+        cells = [x for row in expected for x in row]
+        grid = tuple(tuple(cells[k] for k in cell_perm[r * 6:(r + 1) * 6]) for r in range(6))
+        assert solve_puzzle(clues) == grid
+        assert cache.solve(clues) == grid
+    assert (cache.hits, cache.misses) == (7, 1)
+    print("hit rate: %.2f" % cache.hit_rate())
+
+    # A second cache sharing an on-disk store finds the puzzle there.
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'solutions.sqlite')
+        CachedSolver(store=SolutionStore(path)).solve(puzzle_clues)
+        cache = CachedSolver(store=SolutionStore(path))
+        assert cache.solve(puzzle_clues) == expected
+        assert (cache.store_hits, cache.misses) == (1, 0)
+
+        # solve_puzzle and solve_many use SKYSCRAPER_STORE when it is set.
+        from skyscraper import solve_many
+        other = os.path.join(tmp, 'other.sqlite')
+        os.environ['SKYSCRAPER_STORE'] = other
+        try:
+            assert solve_puzzle(puzzle_clues) == expected
+            mirrored = tuple(puzzle_clues[i] for i in symmetries(6)[1][0])
+            assert list(solve_many([mirrored], workers=1)) == [solve_puzzle(mirrored)]
+        finally:
+            del os.environ['SKYSCRAPER_STORE']
+        found, cells = SolutionStore(other).lookup(canonical(puzzle_clues)[0])
+        assert found and cells is not None
+
+    # A timed-out search is not cached.
+    import time
+    cache = CachedSolver()
+    empty = (0,) * 24
+    assert cache.solve(empty, deadline=time.monotonic() - 1) is TIMED_OUT
+    assert cache.solve(empty) is not None and cache.misses == 1
+
+    print("\nAll sample tests passed!")
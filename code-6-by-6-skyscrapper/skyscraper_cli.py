@@ -0,0 +1,198 @@
+import argparse
+import collections
+import json
+import os
+import sys
+
+from skyscraper import grid_size, solve_many
+
+# Command-line solver. Reads one puzzle per line from a file or stdin and
+# writes one solution per line as soon as it is known:
+#
+#   python skyscraper_cli.py puzzles.jsonl > solutions.jsonl
+#   cat dump.csv | python skyscraper_cli.py --workers 8 --output csv
+#
+# An input line is either JSON (a list of clues, or an object with a "clues"
+# list) or the clues separated by commas and/or whitespace. Blank lines and
+# lines starting with '#' are skipped; every other line gets exactly one
+# output line, in input order, so CSV rows (which carry no clues) line up
+# with the puzzle lines. Everything is a generator from input to output, so
+# memory stays flat no matter how large the input is.
+
+
+# Clue tuple from decoded JSON: a list of clues or an object with a "clues"
+# list. Raises ValueError for anything that is not a valid clue tuple.
+def parse_clues(data):
+    if isinstance(data, dict):
+        data = data.get('clues')
+    if not isinstance(data, list) or not all(type(x) is int for x in data):
+        raise ValueError("expected a list of integer clues")
+    clues = tuple(data)
+    grid_size(clues)
+    return clues
+
+
+# Clue tuple from one input line, or None for blank/comment lines. Raises
+# ValueError for anything that is not a valid clue tuple.
+def parse_line(line):
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line[0] in '[{':
+        return parse_clues(json.loads(line))
+    clues = tuple(int(x) for x in line.replace(',', ' ').split())
+    grid_size(clues)
+    return clues
+
+
+# Clue tuples from an iterable of lines, with None in place of each bad
+# line. Bad lines are reported on `errors`; `failures` counts them.
+def read_puzzles(lines, errors, failures):
+    for lineno, line in enumerate(lines, 1):
+        try:
+            clues = parse_line(line)
+        except ValueError as e:
+            failures[0] += 1
+            print("line %d: %s" % (lineno, e), file=errors)
+            yield None
+            continue
+        if clues is not None:
+            yield clues
+
+
+# Bad input lines (clues None) are left out: every JSONL line names its clues.
+def format_jsonl(clues, solution):
+    if clues is None:
+        return None
+    return json.dumps({'clues': list(clues),
+                       'solution': None if solution is None else [list(row) for row in solution]})
+
+
+# Row-major cells separated by commas; an empty line means "no solution" or
+# "bad input line".
+def format_csv(clues, solution):
+    if solution is None:
+        return ''
+    return ','.join(str(x) for row in solution for x in row)
+
+
+FORMATTERS = {'jsonl': format_jsonl, 'csv': format_csv}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve skyscraper puzzles, one per line.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file with one clue tuple per line (default: stdin)")
+    parser.add_argument('-o', '--out', default='-',
+                        help="where to write the solutions (default: stdout)")
+    parser.add_argument('--output', choices=sorted(FORMATTERS), default='jsonl',
+                        help="output format (default: jsonl)")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="solver processes; 0 means one per CPU (default: 1)")
+    parser.add_argument('--chunksize', type=int, default=64,
+                        help="puzzles sent to a worker at a time (default: 64)")
+    parser.add_argument('--store', metavar='PATH',
+                        help="sqlite solution store to consult and fill")
+    parser.add_argument('--tables', metavar='DIR',
+                        help="directory of precomputed table files (see skyscraper_tables.py)")
+    parser.add_argument('--self-test', action='store_true',
+                        help="run the sample tests and exit")
+    args = parser.parse_args(argv)
+    if args.self_test:
+        self_test()
+        return 0
+    if args.tables:
+        # Set before any table is built; pool workers inherit it.
+        os.environ['SKYSCRAPER_TABLES'] = args.tables
+
+    infile = sys.stdin if args.input == '-' else open(args.input)
+    outfile = sys.stdout if args.out == '-' else open(args.out, 'w')
+    fmt = FORMATTERS[args.output]
+    failures = [0]
+
+    # The solver only sees the clues, so remember the ones still in flight
+    # to echo them next to their solution; solve_many keeps input order.
+    # Bad lines (None) never reach the solver but keep their place here.
+    in_flight = collections.deque()
+
+    def remember(puzzles):
+        for clues in puzzles:
+            in_flight.append(clues)
+            if clues is not None:
+                yield clues
+
+    def write(clues, solution):
+        line = fmt(clues, solution)
+        if line is not None:
+            outfile.write(line + '\n')
+            outfile.flush()
+
+    def write_rejected():
+        while in_flight and in_flight[0] is None:
+            write(in_flight.popleft(), None)
+
+    try:
+        puzzles = remember(read_puzzles(infile, sys.stderr, failures))
+        for solution in solve_many(puzzles, workers=args.workers or None,
+                                   chunksize=args.chunksize, store=args.store):
+            write_rejected()
+            write(in_flight.popleft(), solution)
+        write_rejected()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`): stop quietly, and point stdout
+        # at devnull so the interpreter does not complain again on exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    return 1 if failures[0] else 0
+
+
+# --- Local testing: python skyscraper_cli.py --self-test ---
+def self_test():
+    import contextlib
+    import io
+    import tempfile
+
+    from skyscraper import solve_puzzle
+
+    puzzle1 = (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4)
+    puzzle4 = (2,2,1,3, 2,2,3,1, 1,2,2,3, 3,2,1,3)
+    unsolvable = (4,4,4,4, 0,0,0,0, 0,0,0,0, 0,0,0,0)
+    lines = [','.join(map(str, puzzle1)), '1,2,3', '', '# comment', json.dumps(list(puzzle4)),
+             'not a puzzle', ' '.join(map(str, unsolvable)), '[1, 2']
+
+    def cells(clues):
+        return ','.join(str(x) for row in solve_puzzle(clues) for x in row)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'puzzles.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        for output, workers in (('csv', 1), ('csv', 2), ('jsonl', 1)):
+            out = os.path.join(tmp, 'out')
+            errors = io.StringIO()
+            with contextlib.redirect_stderr(errors):
+                status = main([path, '-o', out, '--output', output, '-j', str(workers),
+                               '--chunksize', '1'])
+            assert status == 1
+            assert [line.split(':')[0] for line in errors.getvalue().splitlines()] == \
+                ['line 2', 'line 6', 'line 8']
+            with open(out) as f:
+                written = f.read().splitlines()
+            if output == 'csv':
+                # One row per puzzle line: bad lines and unsolvable puzzles
+                # are empty rows in their place.
+                assert written == [cells(puzzle1), '', cells(puzzle4), '', '', '']
+            else:
+                assert [tuple(json.loads(line)['clues']) for line in written] == \
+                    [puzzle1, puzzle4, unsolvable]
+    print("All sample tests passed!")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,514 @@
+import functools
+import time
+
+from skyscraper import CHECK_INTERVAL, Solver, col_clues, given_cells, grid_size, row_clues
+
+# Per-cell reasoning on skyscraper puzzles. A domain is a bitmask of the
+# heights a cell may still hold, bit x - 1 standing for height x, and a grid
+# of domains is a list of n lists of n of them.
+#
+# deduce() applies the classic rules that read straight off the clues, then
+# the row/column singles, so easy puzzles come out fully or mostly fixed
+# before any search. The permutation solver in skyscraper.py does not need
+# the edge rules (its clue-pair index already keeps exactly the rows that fit
+# both clues of a line), but they are the starting point for reasoning on
+# domains.
+
+
+# The cells seen by clue `index`, nearest first.
+def clue_line(index, n):
+    side, k = divmod(index, n)
+    if side == 0:
+        return [(d, k) for d in range(n)]
+    if side == 1:
+        return [(k, n - 1 - d) for d in range(n)]
+    if side == 2:
+        return [(n - 1 - d, n - 1 - k) for d in range(n)]
+    return [(n - 1 - k, d) for d in range(n)]
+
+
+# Every row and column as a list of cells, rows first.
+def lines(n):
+    return ([[(r, c) for c in range(n)] for r in range(n)]
+            + [[(r, c) for r in range(n)] for c in range(n)])
+
+
+# Domains implied by the clues alone:
+#   - clue 1: the tallest building stands next to the edge;
+#   - clue n: the line rises 1, 2, ..., n away from the edge;
+#   - clue k: the building at distance d from the edge is at most n - k + 1 + d
+#     tall (k - 1 taller ones still have to show up behind it), so the tallest
+#     is never next to an edge with a clue above 1;
+#   - opposite clues a + b == n + 1: the tallest building is at distance a - 1
+#     from a's edge, the only place both clues can see it from.
+def edge_domains(clues, n):
+    full = (1 << n) - 1
+    domains = [[full] * n for _ in range(n)]
+    for index, clue in enumerate(clues):
+        if not clue:
+            continue
+        cells = clue_line(index, n)
+        for d, (r, c) in enumerate(cells):
+            if clue == n:
+                domains[r][c] &= 1 << d
+            else:
+                domains[r][c] &= (1 << min(n, n - clue + 1 + d)) - 1
+        r, c = cells[0]
+        if clue == 1:
+            domains[r][c] &= 1 << (n - 1)
+        elif clue > 1:
+            domains[r][c] &= ~(1 << (n - 1))
+    pairs = ([row_clues(clues, r, n) + ([(r, c) for c in range(n)],) for r in range(n)]
+             + [col_clues(clues, c, n) + ([(r, c) for r in range(n)],) for c in range(n)])
+    for near, far, cells in pairs:
+        if near and far and near + far == n + 1:
+            r, c = cells[near - 1]
+            domains[r][c] &= 1 << (n - 1)
+    return domains
+
+
+# Row/column singles until nothing changes: a fixed cell's height is removed
+# from the rest of its row and column (naked single), and a height that fits
+# only one cell of a line goes there (hidden single). Works in place; False
+# if some cell runs out of heights.
+def singles(domains, n):
+    all_lines = lines(n)
+    changed = True
+    while changed:
+        changed = False
+        for line in all_lines:
+            for r, c in line:
+                d = domains[r][c]
+                if not d:
+                    return False
+                if d & (d - 1) == 0:
+                    for r2, c2 in line:
+                        if (r2, c2) != (r, c) and domains[r2][c2] & d:
+                            domains[r2][c2] &= ~d
+                            changed = True
+            for x in range(n):
+                bit = 1 << x
+                where = [(r, c) for r, c in line if domains[r][c] & bit]
+                if not where:
+                    return False
+                if len(where) == 1:
+                    r, c = where[0]
+                    if domains[r][c] != bit:
+                        domains[r][c] = bit
+                        changed = True
+    return True
+
+
+# Clue rules followed by singles. Returns the domains, or None if that alone
+# shows the puzzle has no solution.
+def deduce(clues, n=None):
+    n = grid_size(clues, n)
+    domains = edge_domains(clues, n)
+    if not singles(domains, n):
+        return None
+    return domains
+
+
+# Number of cells down to a single height.
+def fixed_cells(domains):
+    return sum(1 for row in domains for d in row if d & (d - 1) == 0)
+
+
+# Fixed cells as a grid, 0 where the height is still open; usable as the
+# `givens` of skyscraper.solve_puzzle.
+def domains_to_grid(domains):
+    return tuple(tuple(d.bit_length() if d & (d - 1) == 0 else 0 for d in row)
+                 for row in domains)
+
+
+# Supported heights of one line under its two clues, as new domains for its
+# cells (or None if nothing fits). `doms` lists the cell domains in the
+# direction `near` looks along, `far` is the clue at the other end, 0 meaning
+# no clue.
+#
+# The tallest building, at position p, is seen from both ends and hides
+# everything behind it, so the near clue only counts the cells before p and
+# the far clue only those after it. For each end a dynamic program runs over
+# (tallest so far, number seen) states, with the counts for one tallest
+# value packed into a bitmask: forward from that end over the cells in
+# front of p, and backward from every admissible p (n allowed there, and the
+# other end's count feasible behind it). A height below n at cell i is
+# supported if some path of either end through it reaches an admissible p.
+# Heights are taken distinct along the way but otherwise the line's
+# all-different constraint is left to the singles and Hall pruning.
+def line_supports(doms, near, far, n):
+    top = 1 << (n - 1)
+    backwards = doms[::-1]
+    forward_near = _forward(doms, n)
+    forward_far = _forward(backwards, n)
+    reach_near = _reachable(forward_near, near, n)
+    reach_far = _reachable(forward_far, far, n)[::-1]
+    # p is admissible if both ends can reach it with the right counts.
+    admissible = [bool(doms[p] & top) and reach_near[p] and reach_far[p] for p in range(n)]
+    if not any(admissible):
+        return None
+    support_near = _supports(doms, forward_near, near, n, admissible)
+    support_far = _supports(backwards, forward_far, far, n, admissible[::-1])[::-1]
+    result = []
+    for i in range(n):
+        d = (support_near[i] | support_far[i]) & doms[i]
+        if admissible[i]:
+            d |= top
+        if not d:
+            return None
+        result.append(d)
+    return result
+
+
+# Forward states over the cells of a line, heights below n only:
+# states[i][m] is a bitmask of how many buildings (bit s = s seen) can be
+# visible in cells 0..i-1 with m the tallest of them (0: none yet).
+def _forward(doms, n):
+    low = (1 << (n - 1)) - 1
+    cur = {0: 1}
+    states = [cur]
+    for d in doms[:-1]:
+        d &= low
+        nxt = {}
+        for m, seen in cur.items():
+            if m and d & ((1 << (m - 1)) - 1):
+                nxt[m] = nxt.get(m, 0) | seen
+            above = d >> m << m
+            while above:
+                bit = above & -above
+                above ^= bit
+                v = bit.bit_length()
+                nxt[v] = nxt.get(v, 0) | seen << 1
+        cur = nxt
+        states.append(cur)
+    return states
+
+
+# reach[p]: the cells in front of p can show exactly clue - 1 buildings
+# (anything if clue is 0), from the _forward states of the line.
+def _reachable(states, clue, n):
+    if not clue:
+        return [True] * n
+    want = 1 << (clue - 1)
+    return [any(seen & want for seen in states[p].values()) for p in range(n)]
+
+
+# Heights below n each cell can hold on a path from this end to an
+# admissible position of the tallest building that shows `clue` buildings.
+# Walking back from the far end, back[m] holds the counts s for which state
+# (m, s) in front of the current cell still leads somewhere admissible; it
+# is only needed for the states the forward pass can actually be in.
+def _supports(doms, forward, clue, n, admissible):
+    low = (1 << (n - 1)) - 1
+    want = (1 << (clue - 1)) if clue else (1 << (n + 1)) - 1
+    back = {}
+    supports = [0] * n
+    for i in range(n - 1, -1, -1):
+        d = doms[i] & low
+        here = want if admissible[i] else 0
+        support = 0
+        new_back = {}
+        for m, seen in forward[i].items():
+            bits = here
+            below = d & ((1 << (m - 1)) - 1) if m else 0
+            if below:
+                after = back.get(m, 0)
+                bits |= after
+                if seen & after:
+                    support |= below
+            above = d >> m << m
+            while above:
+                bit = above & -above
+                above ^= bit
+                after = back.get(bit.bit_length(), 0) >> 1
+                bits |= after
+                if seen & after:
+                    support |= bit
+            if bits:
+                new_back[m] = bits
+        supports[i] = support
+        back = new_back
+    return supports
+
+
+# All-different on one line of domains: naked singles, hidden singles and
+# Hall intervals (if k cells only allow heights from an interval of k
+# heights, no other cell of the line can take those heights). Returns the
+# new domains, or None if the line cannot be completed.
+def line_alldiff(doms, n):
+    full = (1 << n) - 1
+    doms = list(doms)
+    while True:
+        changed = False
+        fixed = 0
+        for d in doms:
+            if not d & (d - 1):
+                if not d or fixed & d:
+                    return None
+                fixed |= d
+        if fixed:
+            for i, d in enumerate(doms):
+                if d & (d - 1) and d & fixed:
+                    d &= ~fixed
+                    if not d:
+                        return None
+                    doms[i] = d
+                    changed = True
+        # Heights allowed in exactly one cell.
+        once = twice = 0
+        for d in doms:
+            twice |= once & d
+            once |= d
+        if once != full:
+            return None
+        hidden = once & ~twice
+        if hidden:
+            for i, d in enumerate(doms):
+                h = d & hidden
+                if h and d != h:
+                    if h & (h - 1):
+                        return None
+                    doms[i] = h
+                    changed = True
+        if changed:
+            continue
+        for lo in range(n):
+            for hi in range(lo + 1, n if lo else n - 1):
+                interval = ((1 << (hi + 1)) - 1) ^ ((1 << lo) - 1)
+                inside = 0
+                for d in doms:
+                    if not d & ~interval:
+                        inside += 1
+                size = hi - lo + 1
+                if inside > size:
+                    return None
+                if inside == size:
+                    for i, d in enumerate(doms):
+                        if d & ~interval and d & interval:
+                            doms[i] = d & ~interval
+                            changed = True
+        if not changed:
+            return doms
+
+
+# Both of the above on one line, repeated until neither narrows it any
+# further (line_supports can fix a cell to a height another cell already
+# has, which only line_alldiff notices); None if it cannot be completed.
+# The same line contents come up again and again in a search, so results
+# are kept in a bounded cache.
+@functools.lru_cache(maxsize=1 << 16)
+def narrow_line(doms, near, far, n):
+    while True:
+        new = line_alldiff(doms, n)
+        if new is not None and (near or far):
+            new = line_supports(new, near, far, n)
+        if new is None:
+            return None
+        new = tuple(new)
+        if new == doms:
+            return new
+        doms = new
+
+
+# Cell-domain search state for one puzzle: the domains of all n * n cells,
+# row-major in one list, narrowed by line_alldiff and line_supports on every
+# row and column until nothing changes, then split on the open cell with
+# the fewest heights left. Needs no tables, so memory stays at a few lists
+# per level of the search whatever n is. run() works like
+# skyscraper.SearchState.run().
+class DomainState:
+    def __init__(self, clues, n, givens=()):
+        self.n = n
+        self.lines = []
+        for r in range(n):
+            self.lines.append(([r * n + c for c in range(n)],) + row_clues(clues, r, n))
+        for c in range(n):
+            self.lines.append(([r * n + c for r in range(n)],) + col_clues(clues, c, n))
+        # The two lines through every cell.
+        self.lines_of = [(i // n, n + i % n) for i in range(n * n)]
+        self.nodes = 0
+        self.done = False
+        self.stack = []
+        self.solution = None
+
+        domains = [d for row in edge_domains(clues, n) for d in row]
+        for r, c, x in givens:
+            domains[r * n + c] &= 1 << (x - 1)
+        if self.propagate(domains, range(2 * n)):
+            self.solution = self.descend(domains)
+        else:
+            self.done = True
+
+    # Narrow `domains` in place, starting from the lines in `dirty`; False
+    # if some cell runs out of heights.
+    def propagate(self, domains, dirty):
+        n = self.n
+        queue = list(dirty)
+        queued = set(queue)
+        while queue:
+            k = queue.pop()
+            queued.discard(k)
+            cells, near, far = self.lines[k]
+            doms = tuple(domains[i] for i in cells)
+            new = narrow_line(doms, near, far, n)
+            if new is None:
+                return False
+            # narrow_line leaves line k itself with nothing more to narrow.
+            for i, d, old in zip(cells, new, doms):
+                if d != old:
+                    domains[i] = d
+                    for k2 in self.lines_of[i]:
+                        if k2 != k and k2 not in queued:
+                            queue.append(k2)
+                            queued.add(k2)
+        return True
+
+    # The grid if every cell is fixed; otherwise push a frame for the open
+    # cell with the fewest heights left, ties going to the cell with the
+    # most open cells in its row and column (its choice constrains the most
+    # others), and return None. A fixed grid with a repeated height in some
+    # row or column is rejected (None, no frame) rather than returned.
+    def descend(self, domains):
+        n = self.n
+        open_rows = [0] * n
+        open_cols = [0] * n
+        for i, d in enumerate(domains):
+            if d & (d - 1):
+                open_rows[i // n] += 1
+                open_cols[i % n] += 1
+        best = None
+        for i, d in enumerate(domains):
+            if d & (d - 1):
+                key = (d.bit_count(), -open_rows[i // n] - open_cols[i % n])
+                if best is None or key < best[0]:
+                    best = (key, i)
+        if best is None:
+            full = (1 << n) - 1
+            for k in range(n):
+                row = col = 0
+                for j in range(n):
+                    row |= domains[k * n + j]
+                    col |= domains[j * n + k]
+                if row != full or col != full:
+                    return None
+            return tuple(tuple(domains[r * n + c].bit_length() for c in range(n))
+                         for r in range(n))
+        i = best[1]
+        self.stack.append([domains, i, domains[i]])
+        return None
+
+    # No split point for solve_parallel and friends, which then search
+    # sequentially.
+    def branches(self):
+        return 0
+
+    def run(self, max_nodes=None, max_time=None, deadline=None, cancel=None):
+        if self.solution is not None:
+            solution, self.solution = self.solution, None
+            return solution
+        if max_time is not None:
+            end = time.monotonic() + max_time
+            deadline = end if deadline is None else min(deadline, end)
+        limit = None if max_nodes is None else self.nodes + max_nodes
+        stack = self.stack
+        start = self.nodes
+        while stack:
+            frame = stack[-1]
+            domains, i, untried = frame
+            if not untried:
+                stack.pop()
+                continue
+            if limit is not None and self.nodes >= limit:
+                return self
+            if (self.nodes - start) % CHECK_INTERVAL == 0:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return self
+                if cancel is not None and cancel.is_set():
+                    return self
+            low = untried & -untried
+            frame[2] = untried ^ low
+            self.nodes += 1
+            new = list(domains)
+            new[i] = low
+            if self.propagate(new, self.lines_of[i]):
+                solution = self.descend(new)
+                if solution is not None:
+                    return solution
+        self.done = True
+        return None
+
+
+# skyscraper.Solver that always works on cell domains, whatever the size.
+class DomainSolver(Solver):
+    def start(self, clues, n=None, givens=None):
+        n = grid_size(clues, n)
+        return DomainState(clues, n, given_cells(givens, n))
+
+
+# --- Local testing ---
+if __name__ == '__main__':
+    import random
+
+    from skyscraper import count_solutions, solve_puzzle, visible
+
+    puzzles = [
+        (2,2,1,3, 2,2,3,1, 1,2,2,3, 3,2,1,3),
+        (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4),
+        (0,0,0,2,2,0, 0,0,0,6,3,0, 0,4,0,0,0,0, 4,4,0,3,0,0),
+        (7,0,0,0,2,2,3, 0,0,3,0,0,0,0, 3,0,3,0,0,5,0, 0,0,0,0,5,0,4),
+    ]
+    for clues in puzzles:
+        n = len(clues) // 4
+        domains = deduce(clues)
+        solution = solve_puzzle(clues)
+        # Deduction never rules out the solution.
+        for r in range(n):
+            for c in range(n):
+                assert domains[r][c] >> (solution[r][c] - 1) & 1
+        print("%dx%d: %d of %d cells fixed by deduction" % (n, n, fixed_cells(domains), n * n))
+        assert count_solutions(clues, givens=domains_to_grid(domains)) == count_solutions(clues)
+
+    # An ascending line fixes every cell of it; two 1s on the same edge
+    # cannot both see the tallest building.
+    assert domains_to_grid(deduce((4, 0, 0, 0) + (0,) * 12))[0] == (1, 0, 0, 0)
+    assert deduce((1, 1, 0, 0) + (0,) * 12) is None
+
+    # The cell-domain solver agrees with the permutation solver.
+    solver = DomainSolver()
+    for clues in puzzles:
+        assert solver.solve(clues) == solve_puzzle(clues)
+    assert solver.count_solutions((0,) * 16) == 576
+
+    # Every grid the cell-domain solver returns must fit the clues and have
+    # no repeated height in any row or column.
+    def check(clues, grid):
+        n = len(grid)
+        cols = [tuple(row[j] for row in grid) for j in range(n)]
+        for k in range(n):
+            assert sorted(grid[k]) == sorted(cols[k]) == list(range(1, n + 1))
+            for line, (near, far) in ((grid[k], row_clues(clues, k, n)),
+                                      (cols[k], col_clues(clues, k, n))):
+                assert near in (0, visible(line)) and far in (0, visible(line[::-1]))
+
+    # line_supports once fixed two cells of a row of this puzzle to 3 without
+    # line_alldiff running again on the result.
+    repro = (2,3,0,3,0,2,1,4, 0,4,3,3,3,1,2,2, 3,5,0,0,3,4,0,0, 2,2,0,4,1,3,3,3)
+    check(repro, solver.solve(repro))
+
+    # Clues of random Latin squares with about 30% of them dropped.
+    rng = random.Random(1)
+    for n in (7, 8):
+        for _ in range(15):
+            rows = [[(r + c) % n + 1 for c in range(n)] for r in range(n)]
+            rng.shuffle(rows)
+            order = rng.sample(range(n), n)
+            grid = [tuple(row[c] for c in order) for row in rows]
+            cols = [tuple(row[j] for row in grid) for j in range(n)]
+            clues = ([visible(col) for col in cols]
+                     + [visible(row[::-1]) for row in grid]
+                     + [visible(col[::-1]) for col in reversed(cols)]
+                     + [visible(row) for row in reversed(grid)])
+            clues = tuple(x if rng.random() > 0.3 else 0 for x in clues)
+            check(clues, solver.solve(clues))
+
+    print("\nAll sample tests passed!")
@@ -0,0 +1,231 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from skyscraper import TIMED_OUT, _init_worker, _solve_one, get_table
+from skyscraper_cli import parse_clues
+
+# Local HTTP/JSON solver server:
+#
+#   python skyscraper_server.py --port 8080 --workers 4 --warm 6 7
+#
+#   POST /solve  {"clues": [...], "timeout": 2.5}
+#             -> {"clues": [...], "solution": [[...], ...] or null}
+#   POST /batch  {"puzzles": [[...], ...], "timeout": 2.5}
+#             -> {"solutions": [...]}
+#   GET  /health -> {"ok": true, "workers": 4}
+#
+# "timeout" (seconds, per puzzle) is optional; a puzzle that runs out of time
+# comes back with "solution": null and "timed_out": true. Errors are answered
+# with a 4xx status and {"error": message}.
+#
+# Puzzles are solved on a pool of worker processes started with the server,
+# each holding a Solver whose tables for the --warm sizes are built before
+# the first request. The tables are built in the parent first, so with the
+# fork start method the workers share them copy-on-write. Connections are
+# HTTP/1.1 keep-alive and every connection gets its own thread, which waits
+# on the pool while its puzzle is solved.
+
+MAX_BODY = 1 << 20
+
+
+def _warm_worker(sizes, store=None):
+    _init_worker(store)
+    for n in sizes:
+        get_table(n)
+
+
+# The deadline is taken when the worker picks the puzzle up, so every puzzle
+# of a batch gets the whole timeout however long the ones before it took.
+def _solve_entry(clues, timeout=None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    solution = _solve_one(clues, deadline)
+    if solution is TIMED_OUT:
+        return {'clues': list(clues), 'solution': None, 'timed_out': True}
+    return {'clues': list(clues),
+            'solution': None if solution is None else [list(row) for row in solution]}
+
+
+class SolverHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise ValueError("request body larger than %d bytes" % MAX_BODY)
+        return json.loads(self.rfile.read(length))
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'ok': True, 'workers': self.server.workers})
+        else:
+            self.send_json(404, {'error': "no such endpoint: %s" % self.path})
+
+    def do_POST(self):
+        if self.path not in ('/solve', '/batch'):
+            self.send_json(404, {'error': "no such endpoint: %s" % self.path})
+            return
+        try:
+            data = self.read_json()
+            timeout = data.get('timeout') if isinstance(data, dict) else None
+            if timeout is not None and not isinstance(timeout, (int, float)):
+                raise ValueError("timeout must be a number of seconds")
+            if self.path == '/solve':
+                clues = parse_clues(data)
+            else:
+                puzzles = data.get('puzzles') if isinstance(data, dict) else data
+                if not isinstance(puzzles, list):
+                    raise ValueError("expected a list of puzzles")
+                puzzles = [parse_clues(clues) for clues in puzzles]
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too.
+            self.send_json(400, {'error': str(e)})
+            return
+
+        pool = self.server.pool
+        if self.path == '/solve':
+            self.send_json(200, pool.apply(_solve_entry, (clues, timeout)))
+        else:
+            chunksize = max(1, len(puzzles) // (4 * self.server.workers))
+            entries = pool.starmap(_solve_entry, [(clues, timeout) for clues in puzzles],
+                                   chunksize)
+            self.send_json(200, {'solutions': entries})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class SolverServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, warm=(), store=None, verbose=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.verbose = verbose
+        for n in warm:
+            get_table(n)
+        self.pool = multiprocessing.Pool(self.workers, _warm_worker, (tuple(warm), store))
+        try:
+            super().__init__(address, SolverHandler)
+        except BaseException:
+            self.pool.terminate()
+            raise
+
+    def server_close(self):
+        super().server_close()
+        self.pool.terminate()
+        self.pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve skyscraper solutions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to bind (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help="solver processes; 0 means one per CPU (default: 0)")
+    parser.add_argument('--warm', type=int, nargs='*', default=[4, 5, 6], metavar='N',
+                        help="grid sizes to build tables for at startup (default: 4 5 6)")
+    parser.add_argument('--store', metavar='PATH',
+                        help="sqlite solution store to consult and fill")
+    parser.add_argument('--tables', metavar='DIR',
+                        help="directory of precomputed table files (see skyscraper_tables.py)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every request")
+    parser.add_argument('--self-test', action='store_true',
+                        help="run the sample tests against a temporary server and exit")
+    args = parser.parse_args(argv)
+    if args.self_test:
+        self_test()
+        return 0
+    if args.tables:
+        os.environ['SKYSCRAPER_TABLES'] = args.tables
+
+    server = SolverServer((args.host, args.port), args.workers or None, args.warm,
+                          args.store, args.verbose)
+    print("serving on http://%s:%d with %d workers" % (args.host, server.server_port, server.workers),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+# --- Local testing: python skyscraper_server.py --self-test ---
+def self_test():
+    import threading
+    import urllib.error
+    import urllib.request
+
+    from skyscraper import solve_puzzle
+
+    def post(path, data):
+        request = urllib.request.Request(base + path, json.dumps(data).encode(),
+                                         {'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    clues6 = (3,2,2,3,2,1, 1,2,3,3,2,2, 5,1,2,2,4,3, 3,2,1,2,2,4)
+    # Puzzles that each take the solver about 0.2-0.5 s, well under a second
+    # apiece but more than that together.
+    medium = [
+        (0,0,1,3,0,3,2,0,0, 2,4,2,3,0,4,4,0,0, 2,0,2,3,1,3,3,3,4, 0,4,2,0,3,3,2,0,3),
+        (2,2,0,0,2,6,3,3,3, 0,0,4,1,2,4,0,2,3, 3,0,3,1,6,0,3,0,0, 0,4,0,1,0,0,2,3,0),
+        (4,2,5,0,0,3,2,0,0, 0,0,0,0,0,0,0,3,0, 0,0,0,2,4,2,0,0,2, 3,0,0,0,0,0,3,2,4),
+        (0,3,0,0,3,0,5,5,0,0, 2,0,0,1,2,0,0,3,0,0, 6,3,0,0,0,3,2,0,0,0, 0,0,0,3,2,4,6,1,4,0),
+        (3,3,0,0,1,2,3,5,3,0, 3,0,0,2,0,3,4,0,0,0, 0,2,0,3,4,0,1,0,3,0, 0,4,0,2,0,3,3,0,2,2),
+    ]
+
+    server = SolverServer(('127.0.0.1', 0), workers=1, warm=(6,))
+    base = 'http://127.0.0.1:%d' % server.server_port
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        with urllib.request.urlopen(base + '/health') as response:
+            assert json.loads(response.read()) == {'ok': True, 'workers': 1}
+
+        status, entry = post('/solve', {'clues': list(clues6)})
+        assert status == 200
+        assert entry['solution'] == [list(row) for row in solve_puzzle(clues6)]
+
+        # With one worker the puzzles run one after another, and every one of
+        # them gets its own full second however long the earlier ones took.
+        status, data = post('/batch', {'puzzles': medium, 'timeout': 1})
+        assert status == 200
+        for entry in data['solutions']:
+            assert 'timed_out' not in entry and entry['solution'] is not None
+
+        # A puzzle that needs any search at all runs out of a zero timeout.
+        status, entry = post('/solve', {'clues': list(medium[0]), 'timeout': 0})
+        assert status == 200
+        assert entry['timed_out'] and entry['solution'] is None
+
+        status, data = post('/batch', {'puzzles': [list(clues6), [1, 2, 3]]})
+        assert status == 400 and 'error' in data
+        status, data = post('/solve', {'clues': list(clues6), 'timeout': 'soon'})
+        assert status == 400 and 'error' in data
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    print("All sample tests passed!")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from skyscraper import PermTable, RowView
+
+# Precomputed permutation tables on disk. Building skyscraper.PermTable for
+# n = 7 or 8 means enumerating 5,040 or 40,320 permutations and all the
+# bitsets on top of them; this module writes everything once into a compact
+# binary file and maps it back with mmap, so loading is a handful of
+# zero-copy memoryviews and the pages are shared by every process that maps
+# the same file.
+#
+#   python skyscraper_tables.py DIR 7 8     writes DIR/perm7.tbl, DIR/perm8.tbl
+#
+# skyscraper.get_table() picks the files up when the SKYSCRAPER_TABLES
+# environment variable names their directory.
+#
+# File layout (native byte order, recorded in the header): a header, then
+# these sections, each starting on an 8-byte boundary:
+#   rows          n! * n bytes, row of every rank
+#   left, right   n! bytes each, visible counts
+#   masks         n! uint64, packed column masks
+#   pair_index    (n+1)^2 pairs of uint32 (start, length) into the next two
+#   pair_ranks    ranks grouped by (left, right) clue pair, uint16
+#   pair_masks    the matching masks, uint64
+#   pair_bits     (n+1)^2 candidate bitsets of ceil(n!/8) bytes, little-endian
+#   value_bits    n * (n+1) bitsets "value x at position j", same size
+# Ranks fit in uint16 and masks in uint64 up to n = 8, which is also where the
+# permutation approach stops being practical.
+
+MAGIC = b'SKYT'
+VERSION = 1
+SECTIONS = ('rows', 'left', 'right', 'masks', 'pair_index',
+            'pair_ranks', 'pair_masks', 'pair_bits', 'value_bits')
+HEADER = struct.Struct('<4sHBBI')  # magic, version, little-endian?, n, n!
+OFFSETS = struct.Struct('<%dQ' % (2 * len(SECTIONS)))
+MAX_N = 8
+
+
+def table_path(directory, n):
+    return os.path.join(directory, 'perm%d.tbl' % n)
+
+
+# Serialize a PermTable into `path`.
+def write_table(path, table):
+    n = table.n
+    if not 1 <= n <= MAX_N:
+        raise ValueError("table files support 1 <= n <= %d" % MAX_N)
+    count = len(table.rows)
+    nbytes = (count + 7) // 8
+
+    pairs = [(left, right) for left in range(n + 1) for right in range(n + 1)]
+    pair_index = array('I')
+    pair_ranks = array('H')
+    pair_masks = array('Q')
+    for pair in pairs:
+        pair_index.extend((len(pair_ranks), len(table.by_clues[pair])))
+        pair_ranks.extend(table.by_clues[pair])
+        pair_masks.extend(table.mask_by_clues[pair])
+
+    sections = {
+        'rows': bytes(table.rows.data),
+        'left': bytes(table.left),
+        'right': bytes(table.right),
+        'masks': array('Q', table.masks).tobytes(),
+        'pair_index': pair_index.tobytes(),
+        'pair_ranks': pair_ranks.tobytes(),
+        'pair_masks': pair_masks.tobytes(),
+        'pair_bits': b''.join(table.bits_by_clues[pair].to_bytes(nbytes, 'little')
+                              for pair in pairs),
+        'value_bits': b''.join(bits.to_bytes(nbytes, 'little')
+                               for per_value in table.value_bits for bits in per_value),
+    }
+
+    offsets = []
+    pos = HEADER.size + OFFSETS.size
+    for name in SECTIONS:
+        pos += -pos % 8
+        offsets.extend((pos, len(sections[name])))
+        pos += len(sections[name])
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', n, count))
+        f.write(OFFSETS.pack(*offsets))
+        for name, offset in zip(SECTIONS, offsets[::2]):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(sections[name])
+    os.replace(tmp, path)
+
+
+# Same attributes as skyscraper.PermTable, backed by a mapped table file.
+# by_clues / mask_by_clues are memoryviews into the file; the bitsets are
+# turned into ints once (a single memcpy each).
+class MappedPermTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        magic, version, little, n, count = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d table file" % (path, VERSION))
+        if bool(little) != (sys.byteorder == 'little'):
+            raise ValueError("%s was written on a machine with the other byte order" % path)
+        offsets = OFFSETS.unpack_from(view, HEADER.size)
+        section = {}
+        for i, name in enumerate(SECTIONS):
+            start, length = offsets[2 * i], offsets[2 * i + 1]
+            section[name] = view[start:start + length]
+
+        self.n = n
+        self.rows = RowView(section['rows'], n)
+        self.left = section['left']
+        self.right = section['right']
+        self.masks = section['masks'].cast('Q')
+
+        nbytes = (count + 7) // 8
+        pair_index = section['pair_index'].cast('I')
+        pair_ranks = section['pair_ranks'].cast('H')
+        pair_masks = section['pair_masks'].cast('Q')
+        pair_bits = section['pair_bits']
+        self.by_clues = {}
+        self.mask_by_clues = {}
+        self.bits_by_clues = {}
+        k = 0
+        for left in range(n + 1):
+            for right in range(n + 1):
+                start, length = pair_index[2 * k], pair_index[2 * k + 1]
+                self.by_clues[(left, right)] = pair_ranks[start:start + length]
+                self.mask_by_clues[(left, right)] = pair_masks[start:start + length]
+                self.bits_by_clues[(left, right)] = int.from_bytes(
+                    pair_bits[k * nbytes:(k + 1) * nbytes], 'little')
+                k += 1
+
+        all_bits = (1 << count) - 1
+        value_bits = section['value_bits']
+        self.value_bits = []
+        self.clear_bits = []
+        k = 0
+        for j in range(n):
+            bits = []
+            for x in range(n + 1):
+                bits.append(int.from_bytes(value_bits[k * nbytes:(k + 1) * nbytes], 'little'))
+                k += 1
+            self.value_bits.append(bits)
+            self.clear_bits.append([all_bits ^ b for b in bits])
+
+
+def load_table(path):
+    return MappedPermTable(path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit("usage: %s DIR N [N ...]" % sys.argv[0])
+    directory = sys.argv[1]
+    os.makedirs(directory, exist_ok=True)
+    for n in map(int, sys.argv[2:]):
+        path = table_path(directory, n)
+        write_table(path, PermTable(n))
+        print("wrote %s (%d bytes)" % (path, os.path.getsize(path)))